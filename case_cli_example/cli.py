@@ -37,19 +37,611 @@ The script specifically handles passive DNS records, showing how to:
 import argparse
 import logging
 import csv
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
 import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import Dict, List
+from email.utils import formatdate
+from functools import partial
+from itertools import islice
+from operator import itemgetter
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
 from pathlib import Path
 
 import cdo_local_uuid
 from case_utils.namespace import NS_RDF, NS_UCO_CORE, NS_UCO_OBSERVABLE, NS_XSD
 from pyshacl import validate
 from cdo_local_uuid import local_uuid
-from rdflib import Graph, Literal, Namespace, URIRef
+from rdflib import BNode, Graph, Literal, Namespace, URIRef
+from rdflib.namespace import RDFS, SH
+from rdflib.plugins.stores.memory import Memory
+from rdflib.term import Node
 from rdflib.util import guess_format
 
-def process_dns_records(csv_file: str, ns_kb: Namespace, graph: Graph) -> None:
+# Number of triples accumulated before being added to the graph in one call.
+ADD_BATCH_SIZE = 10000
+
+# Number of random UUIDs drawn from the operating system in one call.
+UUID_BATCH_SIZE = 4096
+
+# Number of CSV rows handed to each worker process by --jobs.
+PARALLEL_CHUNK_ROWS = 10000
+
+# Number of CSV rows rendered and written at a time by --streaming-nt.
+STREAM_CHUNK_ROWS = 10000
+
+# CSV columns read for each DNS record, in the order _build_dns_triples
+# expects them.
+DNS_CSV_COLUMNS = (
+    "observable:DomainName",
+    "observable:IPv4Address",
+    "observable:timeDateStamp",
+)
+
+# UCO release that the ontology files are fetched from.  The SPARQL
+# translations of its shapes in _CASE_SHAPES_SPARQL must be kept in step.
+UCO_VERSION = "1.3.0"
+
+# UCO ontology files, with their embedded SHACL shapes, used for validation.
+UCO_ONTOLOGY_URLS: Dict[str, str] = {
+    "core.ttl": f"https://raw.githubusercontent.com/ucoProject/UCO/{UCO_VERSION}/ontology/uco/core/core.ttl",
+    "observable.ttl": f"https://raw.githubusercontent.com/ucoProject/UCO/{UCO_VERSION}/ontology/uco/observable/observable.ttl"
+}
+
+# Cached ontology files younger than this many seconds are used without
+# checking the server for a newer copy.
+ONTOLOGY_CACHE_MAX_AGE = 24 * 60 * 60
+
+# Seconds to wait on the server when downloading or checking an ontology
+# file, before falling back to a cached copy.
+ONTOLOGY_FETCH_TIMEOUT = 10
+
+# UCO ontology graph shared by all validations in this process, and the
+# lock guarding its first load.  See _get_uco_ontology.
+_ONT_GRAPH: Optional[Graph] = None
+_ONT_LOCK = threading.Lock()
+
+# Shapes graphs pruned from the UCO ontology by _get_relevant_shapes, keyed
+# by the classes and predicates of the data they were pruned for.  Guarded
+# by _ONT_LOCK.
+_SHAPES_GRAPHS: Dict[Tuple[FrozenSet[Node], FrozenSet[Node]], Graph] = {}
+
+# Predicates by which one SHACL shape refers to others.
+SHAPE_REFERENCE_PREDICATES = frozenset({
+    SH["and"],
+    SH.node,
+    SH["not"],
+    SH["or"],
+    SH.prefixes,
+    SH.property,
+    SH.qualifiedValueShape,
+    SH.xone,
+})
+
+# Environment variable selecting the SHACL validator: "pyshacl", or "jena"
+# for Apache Jena's shacl command.  When unset, Jena is used if its shacl
+# command is on the PATH.
+VALIDATOR_ENV_VAR = "CASE_VALIDATOR"
+
+# Context used to compact JSON-LD output.
+JSON_LD_CONTEXT: Dict[str, str] = {
+    "uco-core": "https://ontology.unifiedcyberontology.org/uco/core/",
+    "uco-observable": "https://ontology.unifiedcyberontology.org/uco/observable/",
+    "xsd": "http://www.w3.org/2001/XMLSchema#"
+}
+
+_SHAPES_SPARQL_PREFIXES = """\
+PREFIX core: <https://ontology.unifiedcyberontology.org/uco/core/>
+PREFIX observable: <https://ontology.unifiedcyberontology.org/uco/observable/>
+PREFIX owl: <http://www.w3.org/2002/07/owl#>
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
+"""
+
+# The UCO_VERSION shapes that can target the nodes this tool writes,
+# translated by hand to SPARQL for validate_case_output(fast=True).  These
+# are the shapes of DNSRecord, DomainNameFacet, IPv4AddressFacet and
+# Relationship and all their superclasses, and the shapes targeting the
+# objects of core:hasFacet.  Each query selects the focus nodes violating
+# the shape, so any result is a violation.
+#
+# sh:maxCount 1 is checked as two distinct values, and sh:minCount 1 as
+# the value not existing.  sh:datatype also requires the lexical form to
+# be valid for the datatype.  sh:class follows rdfs:subClassOf, so the
+# ontology's subclass triples must be in the data graph.
+_CASE_SHAPES_SPARQL: Dict[str, str] = {
+    "core:UcoThing": _SHAPES_SPARQL_PREFIXES + """\
+SELECT ?this
+WHERE {
+    ?this a/rdfs:subClassOf* core:UcoThing .
+    FILTER isBlank(?this)
+}
+""",
+    # Only of severity sh:Info, but pyshacl still reports non-conformance.
+    "core:UcoThing-identifier-regex-shape": _SHAPES_SPARQL_PREFIXES + """\
+SELECT ?this
+WHERE {
+    ?this a/rdfs:subClassOf* core:UcoThing .
+    FILTER (!REGEX(STR(?this), "[0-9a-f]{8}-[0-9a-f]{4}-[0-5][0-9a-f]{3}-[0-9a-f]{4}-[0-9a-f]{12}$", "i"))
+}
+""",
+    "core:hasFacet-shape": _SHAPES_SPARQL_PREFIXES + """\
+SELECT ?this ?value
+WHERE {
+    ?value core:hasFacet ?this .
+    ?nOtherValue core:hasFacet ?this .
+    FILTER (?value != ?nOtherValue)
+    FILTER NOT EXISTS { ?value owl:sameAs|^owl:sameAs ?nOtherValue }
+}
+""",
+    "core:UcoObject": _SHAPES_SPARQL_PREFIXES + """\
+SELECT ?this ?value
+WHERE {
+    ?this a/rdfs:subClassOf* core:UcoObject .
+    {
+        ?this core:hasFacet ?value .
+        FILTER (!isIRI(?value) || NOT EXISTS { ?value a/rdfs:subClassOf* core:Facet })
+    } UNION {
+        ?this core:externalReference ?value .
+        FILTER (!isIRI(?value) || NOT EXISTS { ?value a/rdfs:subClassOf* core:ExternalReference })
+    } UNION {
+        ?this core:objectMarking ?value .
+        FILTER (!isIRI(?value) || NOT EXISTS { ?value a/rdfs:subClassOf* core:MarkingDefinitionAbstraction })
+    } UNION {
+        ?this core:createdBy ?value .
+        FILTER (!isIRI(?value) || NOT EXISTS { ?value a/rdfs:subClassOf* core:IdentityAbstraction })
+    } UNION {
+        ?this core:createdBy ?value, ?other .
+        FILTER (!sameTerm(?value, ?other))
+    } UNION {
+        ?this core:description|core:name|core:specVersion|core:tag ?value .
+        FILTER (!isLiteral(?value) || datatype(?value) != xsd:string)
+    } UNION {
+        ?this core:name ?value, ?other .
+        FILTER (!sameTerm(?value, ?other))
+    } UNION {
+        ?this core:specVersion ?value, ?other .
+        FILTER (!sameTerm(?value, ?other))
+    } UNION {
+        ?this core:modifiedTime|core:objectCreatedTime ?value .
+        FILTER (!isLiteral(?value) || datatype(?value) != xsd:dateTime || !COALESCE(isLiteral(xsd:dateTime(STR(?value))), false))
+    } UNION {
+        ?this core:objectCreatedTime ?value, ?other .
+        FILTER (!sameTerm(?value, ?other))
+    }
+}
+""",
+    "observable:ObservableObject": _SHAPES_SPARQL_PREFIXES + """\
+SELECT ?this ?value
+WHERE {
+    ?this a/rdfs:subClassOf* observable:ObservableObject .
+    {
+        ?this observable:state ?value .
+        FILTER (!isLiteral(?value) || datatype(?value) != xsd:string)
+    } UNION {
+        ?this observable:state ?value, ?other .
+        FILTER (!sameTerm(?value, ?other))
+    } UNION {
+        ?this observable:hasChanged ?value .
+        FILTER (!isLiteral(?value) || datatype(?value) != xsd:boolean || !COALESCE(isLiteral(xsd:boolean(STR(?value))), false))
+    } UNION {
+        ?this observable:hasChanged ?value, ?other .
+        FILTER (!sameTerm(?value, ?other))
+    }
+}
+""",
+    "observable:DomainNameFacet": _SHAPES_SPARQL_PREFIXES + """\
+SELECT ?this ?value
+WHERE {
+    ?this a/rdfs:subClassOf* observable:DomainNameFacet .
+    {
+        ?this observable:value ?value .
+        FILTER (!isLiteral(?value) || datatype(?value) != xsd:string)
+    } UNION {
+        ?this observable:value ?value, ?other .
+        FILTER (!sameTerm(?value, ?other))
+    } UNION {
+        ?this observable:isTLD ?value .
+        FILTER (!isLiteral(?value) || datatype(?value) != xsd:boolean || !COALESCE(isLiteral(xsd:boolean(STR(?value))), false))
+    } UNION {
+        ?this observable:isTLD ?value, ?other .
+        FILTER (!sameTerm(?value, ?other))
+    }
+}
+""",
+    "observable:DigitalAddressFacet": _SHAPES_SPARQL_PREFIXES + """\
+SELECT ?this ?value
+WHERE {
+    ?this a/rdfs:subClassOf* observable:DigitalAddressFacet .
+    {
+        ?this observable:addressValue|observable:displayName ?value .
+        FILTER (!isLiteral(?value) || datatype(?value) != xsd:string)
+    } UNION {
+        ?this observable:addressValue ?value, ?other .
+        FILTER (!sameTerm(?value, ?other))
+    } UNION {
+        ?this observable:displayName ?value, ?other .
+        FILTER (!sameTerm(?value, ?other))
+    }
+}
+""",
+    "core:Relationship": _SHAPES_SPARQL_PREFIXES + """\
+SELECT ?this ?value
+WHERE {
+    ?this a/rdfs:subClassOf* core:Relationship .
+    {
+        ?this a/rdfs:subClassOf* core:Relationship .
+        FILTER NOT EXISTS { ?this core:source ?any }
+    } UNION {
+        ?this core:source ?value .
+        FILTER (!isIRI(?value) || NOT EXISTS { ?value a/rdfs:subClassOf* core:UcoObject })
+    } UNION {
+        ?this a/rdfs:subClassOf* core:Relationship .
+        FILTER NOT EXISTS { ?this core:target ?any }
+    } UNION {
+        ?this core:target ?value .
+        FILTER (!isIRI(?value) || NOT EXISTS { ?value a/rdfs:subClassOf* core:UcoObject })
+    } UNION {
+        ?this core:target ?value, ?other .
+        FILTER (!sameTerm(?value, ?other))
+    } UNION {
+        ?this a/rdfs:subClassOf* core:Relationship .
+        FILTER NOT EXISTS { ?this core:isDirectional ?any }
+    } UNION {
+        ?this core:isDirectional ?value .
+        FILTER (!isLiteral(?value) || datatype(?value) != xsd:boolean || !COALESCE(isLiteral(xsd:boolean(STR(?value))), false))
+    } UNION {
+        ?this core:isDirectional ?value, ?other .
+        FILTER (!sameTerm(?value, ?other))
+    } UNION {
+        ?this core:kindOfRelationship ?value .
+        FILTER (!isLiteral(?value) || datatype(?value) != xsd:string)
+    } UNION {
+        ?this core:kindOfRelationship ?value, ?other .
+        FILTER (!sameTerm(?value, ?other))
+    } UNION {
+        ?this core:endTime|core:startTime ?value .
+        FILTER (!isLiteral(?value) || datatype(?value) != xsd:dateTime || !COALESCE(isLiteral(xsd:dateTime(STR(?value))), false))
+    }
+}
+""",
+}
+
+def _fast_uuid(buf: bytes, cursor: int) -> str:
+    """
+    Format the 16 bytes of buf starting at cursor as a version 4 UUID string, matching str(uuid.uuid4()).
+
+    >>> _fast_uuid(bytes(range(16)), 0)
+    '00010203-0405-4607-8809-0a0b0c0d0e0f'
+    """
+    h = buf[cursor:cursor + 16].hex()
+    # Set the version (4) and variant (RFC 4122) nibbles.
+    return f"{h[:8]}-{h[8:12]}-4{h[13:16]}-{'89ab'[int(h[16], 16) & 3]}{h[17:20]}-{h[20:]}"
+
+def _uuid_strings() -> Iterator[str]:
+    """
+    Yield UUID strings, as repeated calls to cdo_local_uuid.local_uuid() would.
+
+    Random UUIDs are drawn from os.urandom() UUID_BATCH_SIZE at a time, rather than with one system call per UUID.  If cdo_local_uuid has been configured to generate non-random demonstration UUIDs, local_uuid() is used so output remains repeatable.
+    """
+    if cdo_local_uuid.DEMO_UUID_BASE is not None:
+        while True:
+            yield local_uuid()
+    while True:
+        buf = os.urandom(16 * UUID_BATCH_SIZE)
+        for cursor in range(0, len(buf), 16):
+            yield _fast_uuid(buf, cursor)
+
+def _str_literal(value: str) -> Literal:
+    """
+    Return Literal(value) for a plain string value, without Literal.__new__'s datatype and lexical form handling, none of which applies to a string with no datatype or language.
+
+    >>> _str_literal("example.org") == Literal("example.org")
+    True
+    """
+    literal = str.__new__(Literal, value)
+    literal._language = None
+    literal._datatype = None
+    literal._value = value
+    literal._ill_typed = None
+    return literal
+
+def _build_dns_triples(
+    rows: Iterable[Tuple[str, str, str]],
+    kb_prefix: str,
+    records: Optional[List[Dict[str, Any]]] = None,
+) -> Iterator[List[Tuple[Node, Node, Node]]]:
+    """
+    Build the CASE triples for each DNS record row, yielding them in lists of about ADD_BATCH_SIZE triples.
+
+    This is the per-row hot loop of process_dns_records, kept free of any graph or file handling.
+
+    Args:
+        rows: (domain name, IPv4 address, timestamp) for each DNS record
+        kb_prefix: Prefix IRI for knowledge base individuals
+        records: If given, the same nodes are also appended to it as JSON-LD node objects, compacted with JSON_LD_CONTEXT.  Their observationTime values keep the CSV's lexical form, rather than rdflib's normalized form.
+    """
+    # Terms that are the same on every row are looked up or constructed
+    # once here, rather than once per row.
+    p_type = NS_RDF.type
+    p_observation_time = NS_UCO_CORE.observationTime
+    p_record_type = NS_UCO_OBSERVABLE.recordType
+    p_is_passive_dns = NS_UCO_OBSERVABLE.isPassiveDNS
+    p_value = NS_UCO_OBSERVABLE.value
+    p_address_value = NS_UCO_OBSERVABLE.addressValue
+    p_has_facet = NS_UCO_CORE.hasFacet
+    p_source = NS_UCO_CORE.source
+    p_target = NS_UCO_CORE.target
+    p_is_directional = NS_UCO_CORE.isDirectional
+    p_kind_of_relationship = NS_UCO_CORE.kindOfRelationship
+    t_dns_record = NS_UCO_OBSERVABLE.DNSRecord
+    t_domain_name_facet = NS_UCO_OBSERVABLE.DomainNameFacet
+    t_ipv4_address_facet = NS_UCO_OBSERVABLE.IPv4AddressFacet
+    t_relationship = NS_UCO_CORE.Relationship
+    dt_date_time = NS_XSD.dateTime
+    l_record_type_a = Literal("A")
+    l_true = Literal(True)
+    l_resolved_to = Literal("Resolved_To")
+    str_literal = _str_literal
+
+    # JSON-LD keys and types for records.
+    def compact(iri: URIRef) -> str:
+        return _compact_iri(iri, JSON_LD_CONTEXT)
+
+    j_observation_time = compact(p_observation_time)
+    j_record_type = compact(p_record_type)
+    j_is_passive_dns = compact(p_is_passive_dns)
+    j_value = compact(p_value)
+    j_address_value = compact(p_address_value)
+    j_has_facet = compact(p_has_facet)
+    j_source = compact(p_source)
+    j_target = compact(p_target)
+    j_is_directional = compact(p_is_directional)
+    j_kind_of_relationship = compact(p_kind_of_relationship)
+    j_dns_record = compact(t_dns_record)
+    j_domain_name_facet = compact(t_domain_name_facet)
+    j_ipv4_address_facet = compact(t_ipv4_address_facet)
+    j_relationship = compact(t_relationship)
+    j_date_time = compact(dt_date_time)
+
+    uuids = _uuid_strings()
+
+    triples: List[Tuple[Node, Node, Node]] = []
+
+    for domain_name, ipv4_address, time_date_stamp in rows:
+        # Create DNS Record node with UUID
+        dns_record_id = URIRef(kb_prefix + "DNSRecord-" + next(uuids))
+
+        # Create Domain Name Facet with UUID.  Facets are named, rather
+        # than blank nodes, because UCO's shapes require UcoThings to have
+        # IRIs, and require Relationship sources and targets to be IRIs.
+        domain_facet_id = URIRef(kb_prefix + "DomainNameFacet-" + next(uuids))
+
+        # Create IPv4 Address Facet with UUID
+        ip_facet_id = URIRef(kb_prefix + "IPv4AddressFacet-" + next(uuids))
+
+        # Create relationship between domain and IP using proper vocabulary
+        relationship_id = URIRef(kb_prefix + "Relationship-" + next(uuids))
+
+        triples.extend((
+            # Add DNS Record type - fundamental CASE typing
+            (dns_record_id, p_type, t_dns_record),
+            # Add observation time - when this DNS resolution was observed
+            (
+                dns_record_id,
+                p_observation_time,
+                Literal(time_date_stamp, datatype=dt_date_time),
+            ),
+            # Add DNS-specific properties
+            (dns_record_id, p_record_type, l_record_type_a),
+            (dns_record_id, p_is_passive_dns, l_true),
+            (domain_facet_id, p_type, t_domain_name_facet),
+            # Using value property as per mappings
+            (domain_facet_id, p_value, str_literal(domain_name)),
+            (ip_facet_id, p_type, t_ipv4_address_facet),
+            # Using addressValue property as per mappings
+            (ip_facet_id, p_address_value, str_literal(ipv4_address)),
+            # Link facets to DNS Record
+            (dns_record_id, p_has_facet, domain_facet_id),
+            (dns_record_id, p_has_facet, ip_facet_id),
+            (relationship_id, p_type, t_relationship),
+            (relationship_id, p_source, domain_facet_id),
+            (relationship_id, p_target, ip_facet_id),
+            # Add required isDirectional property
+            (relationship_id, p_is_directional, l_true),
+            # Add kindOfRelationship as a string
+            (relationship_id, p_kind_of_relationship, l_resolved_to),
+        ))
+
+        if records is not None:
+            records.extend((
+                {
+                    "@id": dns_record_id,
+                    "@type": j_dns_record,
+                    j_observation_time: {"@type": j_date_time, "@value": time_date_stamp},
+                    j_record_type: "A",
+                    j_is_passive_dns: True,
+                    j_has_facet: [{"@id": domain_facet_id}, {"@id": ip_facet_id}],
+                },
+                {
+                    "@id": domain_facet_id,
+                    "@type": j_domain_name_facet,
+                    j_value: domain_name,
+                },
+                {
+                    "@id": ip_facet_id,
+                    "@type": j_ipv4_address_facet,
+                    j_address_value: ipv4_address,
+                },
+                {
+                    "@id": relationship_id,
+                    "@type": j_relationship,
+                    j_source: {"@id": domain_facet_id},
+                    j_target: {"@id": ip_facet_id},
+                    j_is_directional: True,
+                    j_kind_of_relationship: "Resolved_To",
+                },
+            ))
+
+        if len(triples) >= ADD_BATCH_SIZE:
+            yield triples
+            triples = []
+
+    if triples:
+        yield triples
+
+def _nt_string(value: str) -> str:
+    """
+    Quote value as an N-Triples string literal.
+    """
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n").replace("\r", "\\r") + '"'
+
+def _dns_ntriples(kb_prefix: str, rows: Iterable[Tuple[str, str, str]]) -> str:
+    """
+    Render the CASE triples for each DNS record row as N-Triples text.
+
+    The triples are those from _build_dns_triples, but are built as plain strings, so this can run in a worker process without passing rdflib objects between processes.  Each observationTime literal keeps the CSV's lexical form, rather than rdflib's normalized form.
+
+    Args:
+        kb_prefix: Prefix IRI for knowledge base individuals
+        rows: (domain name, IPv4 address, timestamp) for each DNS record
+    """
+    # Each row's triples are rendered from this template, in which only
+    # the node IRIs' UUIDs and the CSV values vary.
+    dns_record_id = f"<{kb_prefix}DNSRecord-%(dns_record)s>"
+    domain_facet_id = f"<{kb_prefix}DomainNameFacet-%(domain_facet)s>"
+    ip_facet_id = f"<{kb_prefix}IPv4AddressFacet-%(ip_facet)s>"
+    relationship_id = f"<{kb_prefix}Relationship-%(relationship)s>"
+    template = "".join(
+        f"{s} {p.n3()} {o} .\n"
+        for s, p, o in (
+            (dns_record_id, NS_RDF.type, NS_UCO_OBSERVABLE.DNSRecord.n3()),
+            (dns_record_id, NS_UCO_CORE.observationTime, f"%(time_date_stamp)s^^{NS_XSD.dateTime.n3()}"),
+            (dns_record_id, NS_UCO_OBSERVABLE.recordType, Literal("A").n3()),
+            (dns_record_id, NS_UCO_OBSERVABLE.isPassiveDNS, Literal(True).n3()),
+            (domain_facet_id, NS_RDF.type, NS_UCO_OBSERVABLE.DomainNameFacet.n3()),
+            (domain_facet_id, NS_UCO_OBSERVABLE.value, "%(domain_name)s"),
+            (ip_facet_id, NS_RDF.type, NS_UCO_OBSERVABLE.IPv4AddressFacet.n3()),
+            (ip_facet_id, NS_UCO_OBSERVABLE.addressValue, "%(ipv4_address)s"),
+            (dns_record_id, NS_UCO_CORE.hasFacet, domain_facet_id),
+            (dns_record_id, NS_UCO_CORE.hasFacet, ip_facet_id),
+            (relationship_id, NS_RDF.type, NS_UCO_CORE.Relationship.n3()),
+            (relationship_id, NS_UCO_CORE.source, domain_facet_id),
+            (relationship_id, NS_UCO_CORE.target, ip_facet_id),
+            (relationship_id, NS_UCO_CORE.isDirectional, Literal(True).n3()),
+            (relationship_id, NS_UCO_CORE.kindOfRelationship, Literal("Resolved_To").n3()),
+        )
+    )
+
+    # The template is split at its %(name)s placeholders once, here.  The
+    # constant pieces stay at the even positions of block, and each row's
+    # values are put in the odd positions, where the placeholders' names
+    # were, before joining.  This is faster than %-formatting the whole
+    # template per row, since that scans every character of it.
+    fields = (
+        "dns_record",
+        "domain_facet",
+        "ip_facet",
+        "relationship",
+        "time_date_stamp",
+        "domain_name",
+        "ipv4_address",
+    )
+    placeholder = re.compile(r"%\((\w+)\)s")
+    split_template = placeholder.split(template)
+    arrange = itemgetter(*(fields.index(name) for name in split_template[1::2]))
+    block = split_template[:]
+
+    uuids = _uuid_strings()
+    nt_string = _nt_string
+
+    blocks: List[str] = []
+
+    for domain_name, ipv4_address, time_date_stamp in rows:
+        # UUIDs are drawn in the same order as in _build_dns_triples.
+        block[1::2] = arrange((
+            next(uuids),
+            next(uuids),
+            next(uuids),
+            next(uuids),
+            nt_string(time_date_stamp),
+            nt_string(domain_name),
+            nt_string(ipv4_address),
+        ))
+        blocks.append("".join(block))
+
+    return "".join(blocks)
+
+def _read_dns_rows(csv_file: str, use_pandas: bool = False) -> Iterator[Tuple[str, str, str]]:
+    """
+    Yield the DNS_CSV_COLUMNS values of each row of a DNS record CSV file.
+
+    By default the file is read with the csv module.  With use_pandas, it is parsed with pandas' C parser instead, which is faster on large files; pandas is only imported in that case.
+    """
+    if use_pandas:
+        import pandas as pd  # type: ignore
+
+        try:
+            df = pd.read_csv(
+                csv_file,
+                usecols=list(DNS_CSV_COLUMNS),
+                dtype=str,
+                engine="c",
+                keep_default_na=False,
+                na_values=[""],
+            )
+        except pd.errors.EmptyDataError:
+            # An empty file has no records, as with the csv module.
+            return
+        if df.isna().to_numpy().any():
+            # pandas reads both an empty field and a field missing from a
+            # short row as NaN.  The csv module tells them apart, so the
+            # file is read again with it, which raises ValueError for a
+            # short row as below.
+            yield from _read_dns_rows(csv_file)
+            return
+        domain_names, ipv4_addresses, time_date_stamps = (
+            df[column].to_numpy() for column in DNS_CSV_COLUMNS
+        )
+        yield from zip(domain_names, ipv4_addresses, time_date_stamps)
+        return
+
+    with open(csv_file, 'r') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            # An empty file has no records.
+            return
+        i_domain_name, i_ipv4_address, i_time_date_stamp = (
+            header.index(column) for column in DNS_CSV_COLUMNS
+        )
+        n_columns = max(i_domain_name, i_ipv4_address, i_time_date_stamp) + 1
+        for record in reader:
+            # Skip blank lines, as csv.DictReader does.
+            if not record:
+                continue
+            if len(record) < n_columns:
+                raise ValueError(f"{csv_file}, line {reader.line_num}: expected at least {n_columns} columns, found {len(record)}: {record}")
+            yield record[i_domain_name], record[i_ipv4_address], record[i_time_date_stamp]
+
+def process_dns_records(
+    csv_file: str,
+    ns_kb: Namespace,
+    graph: Graph,
+    use_pandas: bool = False,
+    jobs: int = 1,
+    records: Optional[List[Dict[str, Any]]] = None,
+) -> None:
     """
     Process DNS records from CSV and add them to the RDF graph following CASE ontology.
     
@@ -64,6 +656,9 @@ def process_dns_records(csv_file: str, ns_kb: Namespace, graph: Graph) -> None:
         csv_file: Path to CSV file containing DNS records
         ns_kb: Namespace for knowledge base individuals
         graph: RDF graph to add the records to
+        use_pandas: Parse the CSV with pandas rather than the csv module
+        jobs: Number of worker processes building triples; 0 uses one per CPU
+        records: If given, each node is also appended to it as a JSON-LD node object, for write_json_ld_records
     
     CSV Format Expected:
         observable:DomainName: Domain name string (all .org TLD)
@@ -75,113 +670,470 @@ def process_dns_records(csv_file: str, ns_kb: Namespace, graph: Graph) -> None:
     NS_UCO_VOCABULARY = Namespace("https://ontology.unifiedcyberontology.org/uco/vocabulary/")
     graph.namespace_manager.bind("vocabulary", NS_UCO_VOCABULARY)
 
-    with open(csv_file, 'r') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            # Create DNS Record node with UUID
-            dns_record_id = ns_kb[f"DNSRecord-{local_uuid()}"]
-            
-            # Add DNS Record type - fundamental CASE typing
-            graph.add((dns_record_id, NS_RDF.type, NS_UCO_OBSERVABLE.DNSRecord))
-            
-            # Add observation time - when this DNS resolution was observed
-            graph.add((
-                dns_record_id, 
-                NS_UCO_CORE.observationTime, 
-                Literal(row['observable:timeDateStamp'], datatype=NS_XSD.dateTime)
-            ))
-            
-            # Add DNS-specific properties
-            graph.add((
-                dns_record_id,
-                NS_UCO_OBSERVABLE.recordType,
-                Literal("A")
-            ))
-            graph.add((
-                dns_record_id,
-                NS_UCO_OBSERVABLE.isPassiveDNS,
-                Literal(True)
-            ))
+    rows = _read_dns_rows(csv_file, use_pandas)
 
-            # Create Domain Name Facet with UUID
-            domain_facet_id = ns_kb[f"DomainNameFacet-{local_uuid()}"]
-            graph.add((domain_facet_id, NS_RDF.type, NS_UCO_OBSERVABLE.DomainNameFacet))
-            graph.add((
-                domain_facet_id,
-                NS_UCO_OBSERVABLE.value,  # Using value property as per mappings
-                Literal(row['observable:DomainName'])
-            ))
-            
-            # Create IPv4 Address Facet with UUID
-            ip_facet_id = ns_kb[f"IPv4AddressFacet-{local_uuid()}"]
-            graph.add((ip_facet_id, NS_RDF.type, NS_UCO_OBSERVABLE.IPv4AddressFacet))
-            graph.add((
-                ip_facet_id,
-                NS_UCO_OBSERVABLE.addressValue,  # Using addressValue property as per mappings
-                Literal(row['observable:IPv4Address'])
-            ))
-            
-            # Link facets to DNS Record
-            graph.add((dns_record_id, NS_UCO_CORE.hasFacet, domain_facet_id))
-            graph.add((dns_record_id, NS_UCO_CORE.hasFacet, ip_facet_id))
-
-            # Create relationship between domain and IP using proper vocabulary
-            relationship_id = ns_kb[f"Relationship-{local_uuid()}"]
-            graph.add((relationship_id, NS_RDF.type, NS_UCO_CORE.Relationship))
-            graph.add((relationship_id, NS_UCO_CORE.source, domain_facet_id))
-            graph.add((relationship_id, NS_UCO_CORE.target, ip_facet_id))
-            # Add required isDirectional property
-            graph.add((
-                relationship_id,
-                NS_UCO_CORE.isDirectional,
-                Literal(True)
-            ))
-            # Add kindOfRelationship as a string
-            graph.add((
-                relationship_id,
-                NS_UCO_CORE.kindOfRelationship,
-                Literal("Resolved_To")
-            ))
+    if jobs != 1 and cdo_local_uuid.DEMO_UUID_BASE is not None:
+        # Demonstration UUIDs come from a per-process counter, so they
+        # would repeat across worker processes.
+        logging.warning(f"Non-random UUIDs are configured; ignoring jobs={jobs} and building triples in one process.")
+        jobs = 1
+
+    if jobs != 1 and records is not None:
+        # Worker processes only return N-Triples text.
+        logging.warning(f"JSON-LD records were requested; ignoring jobs={jobs} and building triples in one process.")
+        jobs = 1
+
+    if jobs != 1:
+        # Rows are split into chunks, and each worker renders its chunk as
+        # N-Triples text, which is cheap to send back to this process.
+        chunks = iter(lambda: list(islice(rows, PARALLEL_CHUNK_ROWS)), [])
+        with ProcessPoolExecutor(max_workers=jobs or os.cpu_count()) as executor:
+            for ntriples in executor.map(partial(_dns_ntriples, str(ns_kb)), chunks):
+                graph.parse(data=ntriples, format="nt")
+        return
+
+    # Node IRIs are concatenated onto the prefix string and built with
+    # URIRef directly, skipping the Namespace item lookup.  Triples are
+    # handed to the graph in batches, which costs far less per triple
+    # than calling graph.add() for each one.
+    batches = _build_dns_triples(rows, str(ns_kb), records)
+    store = graph.store
+    if isinstance(store, Memory):
+        # The triples are known to be well-formed and to belong to this
+        # graph, so the default in-memory store is given them directly,
+        # skipping the checks Graph.addN makes on each one.
+        store_add = store.add
+        for triples in batches:
+            for triple in triples:
+                store_add(triple, graph, False)
+    else:
+        for triples in batches:
+            graph.addN((s, p, o, graph) for (s, p, o) in triples)
+
+def write_dns_ntriples(
+    csv_file: str,
+    ns_kb: Namespace,
+    out_fh: TextIO,
+    use_pandas: bool = False,
+) -> None:
+    """
+    Write the CASE triples for the DNS records in a CSV file to out_fh as N-Triples, without building a graph.
+
+    Rows are rendered STREAM_CHUNK_ROWS at a time, so memory use does not grow with the size of the input.  The triples are those process_dns_records adds to a graph, except that each observationTime literal keeps the CSV's lexical form, where the graph has rdflib's normalized form of the same value, such as +00:00 for Z.
+
+    Args:
+        csv_file: Path to CSV file containing DNS records
+        ns_kb: Namespace for knowledge base individuals
+        out_fh: Text file to write to
+        use_pandas: Parse the CSV with pandas rather than the csv module
+    """
+    kb_prefix = str(ns_kb)
+    rows = _read_dns_rows(csv_file, use_pandas)
+    for chunk in iter(lambda: list(islice(rows, STREAM_CHUNK_ROWS)), []):
+        out_fh.write(_dns_ntriples(kb_prefix, chunk))
+
+def _compact_iri(iri: str, context: Dict[str, str]) -> str:
+    """
+    Shorten iri to a prefixed name if it falls in one of the context's namespaces.
+
+    >>> _compact_iri("http://www.w3.org/2001/XMLSchema#dateTime", JSON_LD_CONTEXT)
+    'xsd:dateTime'
+    >>> _compact_iri("http://example.org/kb/x", JSON_LD_CONTEXT)
+    'http://example.org/kb/x'
+    """
+    for prefix, namespace in context.items():
+        if iri.startswith(namespace) and len(iri) > len(namespace):
+            return prefix + ":" + iri[len(namespace):]
+    return iri
 
-def validate_case_output(output_file: str) -> bool:
+def _json_ld_object(
+    o: Node, context: Dict[str, str]
+) -> Union[str, bool, int, Dict[str, str]]:
+    """
+    Render an RDF object as a compacted JSON-LD value.
+    """
+    if isinstance(o, Literal):
+        lexical = str(o)
+        if o.language is not None:
+            return {"@value": lexical, "@language": o.language}
+        datatype = o.datatype
+        if datatype is None or datatype == NS_XSD.string:
+            return lexical
+        # Native JSON values are only used where they read back as the
+        # same lexical form.
+        if datatype == NS_XSD.boolean and lexical in ("true", "false"):
+            return lexical == "true"
+        if datatype == NS_XSD.integer and isinstance(o.value, int) and str(o.value) == lexical:
+            return o.value
+        return {"@value": lexical, "@type": _compact_iri(datatype, context)}
+    if isinstance(o, BNode):
+        return {"@id": "_:" + o}
+    return {"@id": _compact_iri(str(o), context)}
+
+def serialize_json_ld(graph: Graph, destination: str, context: Dict[str, str]) -> None:
+    """
+    Write graph as flattened, compacted JSON-LD.
+
+    rdflib's general JSON-LD serializer resolves the context against every term and makes several passes over the graph.  The context here is a small set of prefixes, so nodes are grouped by subject in a single pass over the triples and written with the json module.
+
+    Args:
+        graph: RDF graph to write
+        destination: Path of the output file
+        context: JSON-LD context, mapping prefixes to namespace IRIs
+    """
+    # Predicate and class IRIs repeat on every node, so their compacted
+    # forms are cached.
+    compacted: Dict[Node, str] = {}
+    nodes: Dict[Node, Dict[str, Any]] = {}
+    rdf_type = NS_RDF.type
+
+    for s, p, o in graph:
+        node = nodes.get(s)
+        if node is None:
+            node_id = "_:" + s if isinstance(s, BNode) else _compact_iri(str(s), context)
+            node = nodes[s] = {"@id": node_id}
+
+        value: Union[str, bool, int, Dict[str, str]]
+        if p == rdf_type and isinstance(o, URIRef):
+            key = "@type"
+            value = compacted.get(o) or compacted.setdefault(o, _compact_iri(o, context))
+        else:
+            key = compacted.get(p) or compacted.setdefault(p, _compact_iri(str(p), context))
+            value = _json_ld_object(o, context)
+
+        existing = node.get(key)
+        if existing is None:
+            node[key] = value
+        elif isinstance(existing, list):
+            existing.append(value)
+        else:
+            node[key] = [existing, value]
+
+    with open(destination, "w", encoding="utf-8") as out_fh:
+        json.dump(
+            {"@context": context, "@graph": list(nodes.values())},
+            out_fh,
+            indent=2,
+            ensure_ascii=False,
+        )
+        out_fh.write("\n")
+
+def write_json_ld_records(
+    records: List[Dict[str, Any]], destination: str, context: Dict[str, str]
+) -> None:
+    """
+    Write JSON-LD node objects, as built by process_dns_records, as one JSON-LD document.
+
+    The output is not indented.  orjson is used if it is installed, and otherwise the json module's C encoder.
+    """
+    document = {"@context": context, "@graph": records}
+    try:
+        import orjson  # type: ignore[import-not-found, unused-ignore]
+    except ImportError:
+        with open(destination, "w", encoding="utf-8") as out_fh:
+            json.dump(document, out_fh, ensure_ascii=False, separators=(",", ":"))
+    else:
+        with open(destination, "wb") as out_bfh:
+            out_bfh.write(orjson.dumps(document))
+
+def _ontology_cache_dir() -> Path:
+    """
+    Directory holding local copies of the UCO ontology files, under $XDG_CACHE_HOME (default ~/.cache).
+    """
+    cache_home = os.getenv("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+    return Path(cache_home) / "case_cli_example"
+
+def _parse_ontology_file(ont_graph: Graph, name: str, url: str) -> None:
+    """
+    Parse the Turtle ontology file at url into ont_graph, using a local N-Triples copy where possible.
+
+    The file is downloaded on first use, and cached converted to N-Triples, which rdflib parses faster than Turtle.  The cached copy is named by a hash of url, so a changed URL is not served from another URL's copy.  A cached copy older than ONTOLOGY_CACHE_MAX_AGE is revalidated with a conditional request, and only downloaded again if the server has changed it.  If the server cannot be reached within ONTOLOGY_FETCH_TIMEOUT, or sends something that does not parse, the cached copy is used, and is not checked again for another ONTOLOGY_CACHE_MAX_AGE.  If the cache cannot be written, the download is used without caching it.
+    """
+    cache_dir = _ontology_cache_dir()
+    cache_name = f"{Path(name).stem}-{hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]}"
+    # The N-Triples file's mtime marks when the cache was last checked.
+    nt_path = cache_dir / (cache_name + ".nt")
+    etag_path = cache_dir / (cache_name + ".etag")
+
+    headers: Dict[str, str] = {}
+    if nt_path.exists():
+        mtime = nt_path.stat().st_mtime
+        if time.time() - mtime < ONTOLOGY_CACHE_MAX_AGE:
+            ont_graph.parse(nt_path, format="nt")
+            return
+        headers["If-Modified-Since"] = formatdate(mtime, usegmt=True)
+        if etag_path.exists():
+            headers["If-None-Match"] = etag_path.read_text().strip()
+
+    try:
+        request = urllib.request.Request(url, headers=headers)
+        with urllib.request.urlopen(request, timeout=ONTOLOGY_FETCH_TIMEOUT) as response:
+            data = response.read()
+            etag = response.headers.get("ETag")
+        # Parse before writing anything, so a bad download, such as a
+        # proxy's error page, does not replace a good cached copy.
+        graph = Graph()
+        graph.parse(data=data, format="turtle")
+    except Exception as e:
+        if not headers:
+            raise
+        if isinstance(e, urllib.error.HTTPError) and e.code == 304:
+            logging.debug(f"Cached copy of {url} is current")
+        else:
+            logging.warning(f"Could not check {url} for updates ({e}); using cached copy")
+        # The cached copy is marked as checked even if the check failed,
+        # so an outage costs one attempt per ONTOLOGY_CACHE_MAX_AGE rather
+        # than one per run.
+        try:
+            nt_path.touch()
+        except OSError as touch_error:
+            logging.debug(f"Could not mark {nt_path} as checked ({touch_error})")
+        ont_graph.parse(nt_path, format="nt")
+        return
+
+    # The N-Triples file is written under a temporary name first, so an
+    # interrupted write is not mistaken for a cached copy.  It is written
+    # before the ETag, so an interruption cannot pair an old copy with a
+    # new ETag.
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        partial_nt_path = nt_path.with_name(nt_path.name + ".part")
+        graph.serialize(destination=partial_nt_path, format="nt", encoding="utf-8")
+        partial_nt_path.replace(nt_path)
+        if etag is None:
+            etag_path.unlink(missing_ok=True)
+        else:
+            etag_path.write_text(etag)
+        logging.debug(f"Cached {url} at {nt_path}")
+    except OSError as e:
+        logging.warning(f"Could not cache {url} in {cache_dir} ({e})")
+
+    ont_graph += graph
+
+def _load_uco_ontology() -> Graph:
+    """
+    Load the UCO ontology files, which include the SHACL shapes, into one graph.
+    """
+    ont_graph = Graph()
+
+    # Try loading each ontology file separately with error reporting
+    for name, url in UCO_ONTOLOGY_URLS.items():
+        try:
+            _parse_ontology_file(ont_graph, name, url)
+            logging.info(f"Successfully loaded {name}")
+        except Exception as e:
+            logging.error(f"Failed to load {name} from {url}")
+            logging.error(f"Error: {str(e)}")
+            raise
+
+    return ont_graph
+
+def _get_uco_ontology() -> Graph:
+    """
+    Return the UCO ontology graph, loading it on first use.
+
+    The graph is loaded at most once per process, even when validations run in several threads at once, and is shared by all callers; callers must not modify it.  If loading fails, the next call tries again.
+    """
+    global _ONT_GRAPH
+    with _ONT_LOCK:
+        if _ONT_GRAPH is None:
+            _ONT_GRAPH = _load_uco_ontology()
+        return _ONT_GRAPH
+
+def _jena_shacl_command() -> Optional[str]:
+    """
+    Return the path of Apache Jena's shacl command if it is to be used for validation, or None to use pyshacl.
+    """
+    validator = os.getenv(VALIDATOR_ENV_VAR)
+    if validator and validator not in ("jena", "pyshacl"):
+        logging.warning(f"Ignoring {VALIDATOR_ENV_VAR}={validator!r}, which is neither jena nor pyshacl")
+    if validator == "pyshacl":
+        return None
+    command = shutil.which("shacl")
+    if command is None and validator == "jena":
+        logging.warning(f"{VALIDATOR_ENV_VAR}=jena, but Jena's shacl command was not found; using pyshacl")
+    return command
+
+def _validate_with_jena(command: str, data_graph: Graph, shacl_graph: Graph, ont_graph: Graph) -> Tuple[bool, str]:
+    """
+    Validate data_graph against shacl_graph with Apache Jena's shacl command, returning whether it conforms and the validation report text.
+
+    As with pyshacl's ont_graph argument, the ontology is mixed into the data graph, so class targets follow the ontology's subclass hierarchy.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        shapes_path = Path(tmpdir) / "shapes.nt"
+        data_path = Path(tmpdir) / "data.nt"
+        shacl_graph.serialize(destination=shapes_path, format="nt", encoding="utf-8")
+        (data_graph + ont_graph).serialize(destination=data_path, format="nt", encoding="utf-8")
+        completed = subprocess.run(
+            [command, "validate", "--shapes", str(shapes_path), "--data", str(data_path)],
+            capture_output=True,
+            text=True,
+        )
+
+    if not completed.stdout.strip():
+        raise RuntimeError(f"{command} exited with status {completed.returncode}: {completed.stderr.strip()}")
+
+    report_graph = Graph()
+    report_graph.parse(data=completed.stdout, format="turtle")
+    conforms = (None, SH.conforms, Literal(True)) in report_graph
+    return conforms, completed.stdout
+
+def _validate_with_sparql(data_graph: Graph) -> Tuple[bool, str]:
+    """
+    Validate data_graph with the _CASE_SHAPES_SPARQL queries, returning whether it conforms and a report of the violations found.
+
+    data_graph must already hold the ontology's rdfs:subClassOf triples, which the queries' class paths follow.
+    """
+    violations = []
+    for shape_name, query in _CASE_SHAPES_SPARQL.items():
+        for row in data_graph.query(query):
+            values = " ".join(term.n3() for term in row if term is not None)  # type: ignore[union-attr]
+            violations.append(f"{shape_name}: {values}")
+    return not violations, "\n".join(violations)
+
+def _untyped_subjects(data_graph: Graph) -> List[Node]:
+    """
+    Return the subjects in data_graph that have no rdf:type.
+
+    Validation runs without RDFS inference, so shapes targeting a class would silently skip these nodes.
+    """
+    return [
+        subject
+        for subject in set(data_graph.subjects())
+        if (subject, NS_RDF.type, None) not in data_graph
+    ]
+
+def _domain_range_types(data_graph: Graph, ont_graph: Graph) -> Graph:
+    """
+    Return the rdf:type triples that RDFS entailment derives from the rdfs:domain and rdfs:range of the predicates used in data_graph.
+
+    Subclass reasoning is not needed, since SHACL class targets and sh:class constraints follow rdfs:subClassOf in the ontology mixed into the data graph.  Domains and ranges are the only other RDFS entailments that shapes here can depend on - for instance, the range of core:source and core:target is core:UcoObject.
+    """
+    types_graph = Graph()
+    for predicate in set(data_graph.predicates()):
+        for domain in ont_graph.objects(predicate, RDFS.domain):
+            for subject in data_graph.subjects(predicate, None):
+                types_graph.add((subject, NS_RDF.type, domain))
+        for range_ in ont_graph.objects(predicate, RDFS.range):
+            for object_ in data_graph.objects(None, predicate):
+                if not isinstance(object_, Literal):
+                    types_graph.add((object_, NS_RDF.type, range_))
+    return types_graph
+
+def _relevant_shapes(ont_graph: Graph, classes: FrozenSet[Node], predicates: FrozenSet[Node]) -> Graph:
+    """
+    Return the SHACL shapes in ont_graph that can target nodes typed with classes, or subjects or objects of predicates, with the blank nodes and other shapes they refer to.
+
+    UCO mostly targets shapes implicitly, by making its classes shapes themselves, so the shapes of the classes' superclasses are included too.
+    """
+    superclasses = set(classes)
+    pending = list(classes)
+    while pending:
+        for superclass in ont_graph.objects(pending.pop(), RDFS.subClassOf):
+            if isinstance(superclass, URIRef) and superclass not in superclasses:
+                superclasses.add(superclass)
+                pending.append(superclass)
+
+    roots = set(ont_graph.subjects(SH.targetNode, None))
+    for class_ in superclasses:
+        if (class_, NS_RDF.type, SH.NodeShape) in ont_graph:
+            roots.add(class_)
+        roots.update(ont_graph.subjects(SH.targetClass, class_))
+    for predicate in predicates:
+        roots.update(ont_graph.subjects(SH.targetSubjectsOf, predicate))
+        roots.update(ont_graph.subjects(SH.targetObjectsOf, predicate))
+
+    shapes_graph = Graph()
+    visited = set()
+    pending = list(roots)
+    while pending:
+        node = pending.pop()
+        if node in visited:
+            continue
+        visited.add(node)
+        for predicate, object_ in ont_graph.predicate_objects(node):
+            shapes_graph.add((node, predicate, object_))
+            # Blank nodes hold property shapes, SPARQL constraints, and
+            # RDF lists, including lists of shapes.
+            if isinstance(object_, BNode) or predicate in SHAPE_REFERENCE_PREDICATES:
+                pending.append(object_)
+    return shapes_graph
+
+def _get_relevant_shapes(data_graph: Graph, ont_graph: Graph) -> Graph:
+    """
+    Return _relevant_shapes for the classes and predicates used in data_graph, pruning them from ont_graph on first use.  Callers must not modify the returned graph.
+
+    Validating against these shapes alone gives the same results as validating against all of ont_graph, since no other shape can target a node in data_graph.
+    """
+    classes = frozenset(data_graph.objects(None, NS_RDF.type))
+    predicates = frozenset(data_graph.predicates())
+    key = (classes, predicates)
+    with _ONT_LOCK:
+        if key not in _SHAPES_GRAPHS:
+            _SHAPES_GRAPHS[key] = _relevant_shapes(ont_graph, classes, predicates)
+        return _SHAPES_GRAPHS[key]
+
+def validate_case_output(data: Union[str, Graph], fast: bool = False) -> bool:
     """
     Validate the generated CASE JSON-LD output using PyShacl with UCO ontology.
     The SHACL rules are embedded in the ontology TTL files.
+
+    data may be the path of an output file, or the graph itself.  Passing the graph that was just serialized avoids parsing the file back in.  The graph is not modified.
+
+    Apache Jena's shacl command is used instead of PyShacl when it is on the PATH, or when selected with the CASE_VALIDATOR environment variable.
+
+    If fast is True, only the shapes for the classes this tool writes are checked, with the SPARQL queries in _CASE_SHAPES_SPARQL, instead of running a SHACL validator.
     """
     try:
-        # Load the data graph
+        # Load the data graph.  A given graph is copied, since types are
+        # added to the data graph below.
         data_graph = Graph()
-        data_graph.parse(output_file, format="json-ld")
+        if isinstance(data, Graph):
+            data_graph += data
+        else:
+            data_graph.parse(data, format=guess_format(data) or "json-ld")
         
         # Load UCO ontology (which includes SHACL shapes)
-        ont_graph = Graph()
-        
-        # Try loading each ontology file separately with error reporting
-        urls = {
-            "core.ttl": "https://raw.githubusercontent.com/ucoProject/UCO/master/ontology/uco/core/core.ttl",
-            "observable.ttl": "https://raw.githubusercontent.com/ucoProject/UCO/master/ontology/uco/observable/observable.ttl"
-        }
-        
-        for name, url in urls.items():
-            try:
-                ont_graph.parse(url, format="turtle")
-                logging.info(f"Successfully loaded {name}")
-            except Exception as e:
-                logging.error(f"Failed to load {name} from {url}")
-                logging.error(f"Error: {str(e)}")
-                return False
-        
-        # Run validation using the ontology graph as both ontology and SHACL shapes
-        conforms, results_graph, results_text = validate(
-            data_graph,
-            shacl_graph=ont_graph,  # Use ontology graph for SHACL shapes
-            ont_graph=ont_graph,
-            inference='rdfs',
-            abort_on_first=False,
-            meta_shacl=False,
-            debug=False
-        )
+        try:
+            ont_graph = _get_uco_ontology()
+        except Exception:
+            return False
         
+        # Full RDFS inference is not run.  Every node this tool emits is
+        # typed, and the only entailments shapes rely on are added here.
+        untyped_subjects = _untyped_subjects(data_graph)
+        if untyped_subjects:
+            logging.error(f"{len(untyped_subjects)} nodes have no rdf:type, e.g. {untyped_subjects[0]}")
+            return False
+        data_graph += _domain_range_types(data_graph, ont_graph)
+
+        if fast:
+            data_graph += ont_graph.triples((None, RDFS.subClassOf, None))
+            conforms, results_text = _validate_with_sparql(data_graph)
+        else:
+            # Only shapes that can target the data's nodes are checked.
+            shacl_graph = _get_relevant_shapes(data_graph, ont_graph)
+            jena_command = _jena_shacl_command()
+            if jena_command is not None:
+                logging.debug(f"Validating with {jena_command}")
+                conforms, results_text = _validate_with_jena(jena_command, data_graph, shacl_graph, ont_graph)
+            else:
+                # Run validation using the ontology graph as the ontology,
+                # and its shapes that apply to the data as the SHACL shapes
+                conforms, results_graph, results_text = validate(
+                    data_graph,
+                    shacl_graph=shacl_graph,
+                    ont_graph=ont_graph,
+                    # data_graph is only used here, so pyshacl need not copy
+                    # it before mixing in the ontology.
+                    inplace=True,
+                    inference='none',
+                    abort_on_first=False,
+                    meta_shacl=False,
+                    debug=False
+                )
+
         if conforms:
             logging.info("Graph conforms to UCO/CASE ontology")
         else:
@@ -234,13 +1186,41 @@ def main() -> None:
         help="Input CSV file containing DNS records.",
         default="data/domain-ip-res.csv"
     )
+    argument_parser.add_argument(
+        "--pandas-csv",
+        action="store_true",
+        help="Parse the input CSV with pandas, which is faster on large files."
+    )
+    argument_parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes used to build records from the CSV.  0 uses one per CPU.  Ignored when non-random UUIDs are configured."
+    )
+    argument_parser.add_argument(
+        "--fast-jsonld",
+        action="store_true",
+        help="For JSON-LD output, write records as they are built rather than serializing the graph.  Implies --jobs 1."
+    )
     argument_parser.add_argument(
         "--validate",
         action="store_true",
         help="Validate the output against CASE ontology"
     )
+    argument_parser.add_argument(
+        "--streaming-nt",
+        action="store_true",
+        help="For N-Triples output, write triples as the CSV is read, without building a graph in memory.  --jobs is ignored.  With --validate, the output file is read back to validate it."
+    )
+    argument_parser.add_argument(
+        "--fast-validate",
+        action="store_true",
+        help="With --validate, check only the shapes for the classes this tool writes, using SPARQL queries rather than a SHACL validator."
+    )
 
     args = argument_parser.parse_args()
+    if args.jobs < 0:
+        argument_parser.error(f"--jobs must be 0 or more, not {args.jobs}.")
     logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
 
     # Configure UUID generation
@@ -256,31 +1236,54 @@ def main() -> None:
     graph.namespace_manager.bind("uco-observable", NS_UCO_OBSERVABLE)
     graph.namespace_manager.bind("xsd", NS_XSD)
 
-    # Process DNS records
-    process_dns_records(args.dns_csv, ns_kb, graph)
-
     # Determine output format
     output_format = (
         guess_format(args.out_graph)
         if args.output_format is None
         else args.output_format
     ) or "json-ld"
-    
-    # Write output file
-    graph.serialize(
-        destination=args.out_graph,
-        format=output_format,
-        context={
-            "uco-core": "https://ontology.unifiedcyberontology.org/uco/core/",
-            "uco-observable": "https://ontology.unifiedcyberontology.org/uco/observable/",
-            "xsd": "http://www.w3.org/2001/XMLSchema#"
-        }
-    )
+
+    if args.streaming_nt:
+        if output_format != "nt":
+            argument_parser.error(f"--streaming-nt writes N-Triples, but the output format is {output_format}.")
+        with open(args.out_graph, "w", encoding="utf-8") as out_fh:
+            write_dns_ntriples(args.dns_csv, ns_kb, out_fh, use_pandas=args.pandas_csv)
+    else:
+        # With --fast-jsonld, JSON-LD node objects are collected while the
+        # records are built, and written instead of serializing the graph.
+        records: Optional[List[Dict[str, Any]]] = (
+            [] if args.fast_jsonld and output_format == "json-ld" else None
+        )
+
+        # Process DNS records
+        process_dns_records(
+            args.dns_csv,
+            ns_kb,
+            graph,
+            use_pandas=args.pandas_csv,
+            jobs=args.jobs,
+            records=records,
+        )
+
+        # Write output file
+        if records is not None:
+            write_json_ld_records(records, args.out_graph, JSON_LD_CONTEXT)
+        elif output_format == "json-ld":
+            serialize_json_ld(graph, args.out_graph, JSON_LD_CONTEXT)
+        else:
+            graph.serialize(
+                destination=args.out_graph,
+                format=output_format,
+                context=JSON_LD_CONTEXT
+            )
 
     # Validate if requested
     if args.validate:
         logging.info("Validating output against CASE ontology...")
-        if validate_case_output(args.out_graph):
+        if args.streaming_nt:
+            # Streamed output was never held in a graph, so is read back.
+            graph.parse(args.out_graph, format="nt")
+        if validate_case_output(graph, fast=args.fast_validate):
             logging.info("Validation successful!")
         else:
             logging.error("Validation failed!")
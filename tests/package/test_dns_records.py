@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+
+# Portions of this file contributed by NIST are governed by the
+# following statement:
+#
+# This software was developed at the National Institute of Standards
+# and Technology by employees of the Federal Government in the course
+# of their official duties. Pursuant to Title 17 Section 105 of the
+# United States Code, this software is not subject to copyright
+# protection within the United States. NIST assumes no responsibility
+# whatsoever for its use by other parties, and makes no guarantees,
+# expressed or implied, about its quality, reliability, or any other
+# characteristic.
+#
+# We would appreciate acknowledgement if the software is used.
+
+import logging
+import os
+import re
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, List
+
+import cdo_local_uuid
+import pytest
+from case_utils.namespace import NS_RDF, NS_UCO_CORE, NS_UCO_OBSERVABLE, NS_XSD
+from rdflib import RDFS, SH, BNode, Graph, Literal, Namespace, URIRef
+from rdflib.compare import isomorphic
+
+from case_cli_example.cli import (
+    JSON_LD_CONTEXT,
+    _build_dns_triples,
+    _dns_ntriples,
+    _jena_shacl_command,
+    _parse_ontology_file,
+    _read_dns_rows,
+    _relevant_shapes,
+    _validate_with_jena,
+    _validate_with_sparql,
+    process_dns_records,
+    serialize_json_ld,
+    write_dns_ntriples,
+    write_json_ld_records,
+)
+
+srcdir = Path(__file__).parent
+top_srcdir = srcdir.parent.parent
+
+NS_KB = Namespace("http://example.org/kb/")
+
+ONTOLOGY_URL = "http://example.org/ontology.ttl"
+ONTOLOGY_TURTLE = b"""\
+@prefix owl: <http://www.w3.org/2002/07/owl#> .
+<http://example.org/ontology> a owl:Ontology .
+"""
+
+
+class FakeResponse:
+    """
+    Stands in for the response urllib.request.urlopen returns.
+    """
+
+    def __init__(self, data: bytes, etag: str) -> None:
+        self.data = data
+        self.headers = {"ETag": etag}
+
+    def __enter__(self) -> "FakeResponse":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        pass
+
+    def read(self) -> bytes:
+        return self.data
+
+
+def test_serialize_json_ld_round_trip(tmp_path: Path) -> None:
+    expected = Graph()
+    process_dns_records(str(top_srcdir / "data" / "domain-ip-res.csv"), NS_KB, expected)
+    n_blank = BNode()
+    expected.add((n_blank, NS_RDF.type, NS_UCO_CORE.UcoObject))
+    expected.add((n_blank, NS_UCO_CORE.name, Literal("x", lang="en")))
+    expected.add((n_blank, NS_UCO_CORE.tag, Literal("01", datatype=NS_XSD.integer)))
+    expected.add((n_blank, NS_UCO_CORE.tag, Literal(2)))
+
+    out_path = tmp_path / "output.jsonld"
+    serialize_json_ld(expected, str(out_path), JSON_LD_CONTEXT)
+
+    computed = Graph()
+    computed.parse(out_path, format="json-ld")
+    assert isomorphic(expected, computed)
+
+
+@pytest.mark.parametrize("use_pandas", [False, True])
+def test_read_dns_rows_empty_file(tmp_path: Path, use_pandas: bool) -> None:
+    csv_path = tmp_path / "empty.csv"
+    csv_path.write_text("")
+    assert list(_read_dns_rows(str(csv_path), use_pandas)) == []
+
+
+@pytest.mark.parametrize("use_pandas", [False, True])
+def test_read_dns_rows_short_row(tmp_path: Path, use_pandas: bool) -> None:
+    csv_path = tmp_path / "short.csv"
+    csv_path.write_text(
+        "observable:DomainName,observable:IPv4Address,observable:timeDateStamp\n"
+        "example.org,192.168.1.1\n"
+    )
+    with pytest.raises(ValueError, match="line 2"):
+        list(_read_dns_rows(str(csv_path), use_pandas))
+
+
+@pytest.mark.parametrize("use_pandas", [False, True])
+def test_read_dns_rows_empty_field(tmp_path: Path, use_pandas: bool) -> None:
+    csv_path = tmp_path / "empty-field.csv"
+    csv_path.write_text(
+        "observable:DomainName,observable:IPv4Address,observable:timeDateStamp\n"
+        "example.org,,2023-12-01T10:00:00Z\n"
+    )
+    assert list(_read_dns_rows(str(csv_path), use_pandas)) == [
+        ("example.org", "", "2023-12-01T10:00:00Z")
+    ]
+
+
+def test_dns_ntriples_matches_graph(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    The N-Triples rendering used by worker processes must match the triples built in-process.  Non-random UUIDs are configured so both runs mint the same IRIs.
+    """
+    monkeypatch.setenv("CDO_DEMO_NONRANDOM_UUID_BASE", str(top_srcdir))
+    monkeypatch.setattr(cdo_local_uuid, "DEMO_UUID_BASE", "test_dns_records")
+
+    rows = [
+        ("example.org", "192.168.1.1", "2023-12-01T10:00:00Z"),
+        ('quote"back\\slash.example.org', "192.168.1.2", "2023-12-01T10:15:00Z"),
+    ]
+
+    monkeypatch.setattr(cdo_local_uuid, "DEMO_UUID_COUNTER", 0)
+    expected = Graph()
+    for triples in _build_dns_triples(rows, str(NS_KB)):
+        for triple in triples:
+            expected.add(triple)
+
+    monkeypatch.setattr(cdo_local_uuid, "DEMO_UUID_COUNTER", 0)
+    computed = Graph()
+    computed.parse(data=_dns_ntriples(str(NS_KB), rows), format="nt")
+
+    assert isomorphic(expected, computed)
+
+
+def test_write_dns_ntriples_matches_graph(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    monkeypatch.setenv("CDO_DEMO_NONRANDOM_UUID_BASE", str(top_srcdir))
+    monkeypatch.setattr(cdo_local_uuid, "DEMO_UUID_BASE", "test_dns_records")
+    csv_file = str(top_srcdir / "data" / "domain-ip-res.csv")
+
+    monkeypatch.setattr(cdo_local_uuid, "DEMO_UUID_COUNTER", 0)
+    expected = Graph()
+    process_dns_records(csv_file, NS_KB, expected)
+
+    monkeypatch.setattr(cdo_local_uuid, "DEMO_UUID_COUNTER", 0)
+    out_path = tmp_path / "output.nt"
+    with out_path.open("w", encoding="utf-8") as out_fh:
+        write_dns_ntriples(csv_file, NS_KB, out_fh)
+
+    computed = Graph()
+    computed.parse(out_path, format="nt")
+    assert isomorphic(expected, computed)
+
+    # The graph has rdflib's normalized form of each observation time,
+    # and the N-Triples file has the CSV's.
+    time_date_stamps = [row[2] for row in _read_dns_rows(csv_file)]
+    assert sorted(
+        str(o) for o in expected.objects(None, NS_UCO_CORE.observationTime)
+    ) == sorted(str(Literal(t, datatype=NS_XSD.dateTime)) for t in time_date_stamps)
+    assert sorted(
+        re.findall(r'observationTime> "([^"]*)"', out_path.read_text())
+    ) == sorted(time_date_stamps)
+
+
+def test_write_json_ld_records_matches_graph(tmp_path: Path) -> None:
+    csv_file = str(top_srcdir / "data" / "domain-ip-res.csv")
+    records: List[Dict[str, Any]] = []
+    expected = Graph()
+    process_dns_records(
+        csv_file,
+        NS_KB,
+        expected,
+        records=records,
+    )
+
+    out_path = tmp_path / "output.jsonld"
+    write_json_ld_records(records, str(out_path), JSON_LD_CONTEXT)
+
+    computed = Graph()
+    computed.parse(out_path, format="json-ld")
+    assert isomorphic(expected, computed)
+
+    # The records have each observation time as it is in the CSV.
+    time_date_stamps = [row[2] for row in _read_dns_rows(csv_file)]
+    assert [
+        record["uco-core:observationTime"]["@value"]
+        for record in records
+        if "uco-core:observationTime" in record
+    ] == time_date_stamps
+
+
+@pytest.mark.parametrize(
+    "n_class, n_predicate, l_value, shape",
+    [
+        (
+            NS_UCO_OBSERVABLE.DomainNameFacet,
+            NS_UCO_OBSERVABLE.value,
+            Literal(1),
+            "observable:DomainNameFacet",
+        ),
+        (NS_UCO_OBSERVABLE.DNSRecord, NS_UCO_CORE.name, Literal(3), "core:UcoObject"),
+        (
+            NS_UCO_OBSERVABLE.DNSRecord,
+            NS_UCO_CORE.modifiedTime,
+            Literal("x"),
+            "core:UcoObject",
+        ),
+        (
+            NS_UCO_OBSERVABLE.DNSRecord,
+            NS_UCO_OBSERVABLE.hasChanged,
+            Literal("x"),
+            "observable:ObservableObject",
+        ),
+    ],
+)
+def test_validate_with_sparql(
+    n_class: URIRef, n_predicate: URIRef, l_value: Literal, shape: str
+) -> None:
+    graph = Graph()
+    process_dns_records(str(top_srcdir / "data" / "domain-ip-res.csv"), NS_KB, graph)
+    # The class hierarchy that validate_case_output copies from the ontology.
+    for subclass, superclass in [
+        (NS_UCO_OBSERVABLE.DNSRecord, NS_UCO_OBSERVABLE.ObservableObject),
+        (NS_UCO_OBSERVABLE.ObservableObject, NS_UCO_CORE.UcoObject),
+        (NS_UCO_CORE.Relationship, NS_UCO_CORE.UcoObject),
+        (NS_UCO_CORE.UcoObject, NS_UCO_CORE.UcoThing),
+        (NS_UCO_OBSERVABLE.DomainNameFacet, NS_UCO_CORE.Facet),
+        (NS_UCO_OBSERVABLE.IPv4AddressFacet, NS_UCO_OBSERVABLE.DigitalAddressFacet),
+        (NS_UCO_OBSERVABLE.DigitalAddressFacet, NS_UCO_CORE.Facet),
+        (NS_UCO_CORE.Facet, NS_UCO_CORE.UcoThing),
+    ]:
+        graph.add((subclass, RDFS.subClassOf, superclass))
+    # The rdfs:range typing that validate_case_output adds.
+    for predicate in (NS_UCO_CORE.source, NS_UCO_CORE.target):
+        for n_object in list(graph.objects(None, predicate)):
+            graph.add((n_object, NS_RDF.type, NS_UCO_CORE.UcoObject))
+
+    conforms, _ = _validate_with_sparql(graph)
+    assert conforms
+
+    n_node = next(graph.subjects(NS_RDF.type, n_class))
+    graph.add((n_node, n_predicate, l_value))
+    conforms, results_text = _validate_with_sparql(graph)
+    assert not conforms
+    assert shape in results_text
+
+
+def test_relevant_shapes() -> None:
+    ont_graph = Graph()
+    n_property_shape = BNode()
+    # A superclass's implicitly targeted shape, with its property shape.
+    ont_graph.add((NS_UCO_CORE.Facet, NS_RDF.type, SH.NodeShape))
+    ont_graph.add((NS_UCO_CORE.Facet, SH.property, n_property_shape))
+    ont_graph.add((n_property_shape, SH.path, NS_UCO_CORE.name))
+    ont_graph.add(
+        (NS_UCO_OBSERVABLE.DomainNameFacet, RDFS.subClassOf, NS_UCO_CORE.Facet)
+    )
+    # A shape targeting objects of a predicate.
+    ont_graph.add((NS_KB["hasFacet-shape"], SH.targetObjectsOf, NS_UCO_CORE.hasFacet))
+    # Shapes that cannot target the data.
+    ont_graph.add((NS_UCO_CORE.Relationship, NS_RDF.type, SH.NodeShape))
+    ont_graph.add((NS_KB["source-shape"], SH.targetSubjectsOf, NS_UCO_CORE.source))
+
+    shapes_graph = _relevant_shapes(
+        ont_graph,
+        frozenset([NS_UCO_OBSERVABLE.DomainNameFacet]),
+        frozenset([NS_RDF.type, NS_UCO_CORE.hasFacet]),
+    )
+
+    assert (n_property_shape, SH.path, NS_UCO_CORE.name) in shapes_graph
+    assert (NS_KB["hasFacet-shape"], None, None) in shapes_graph
+    assert (NS_UCO_CORE.Relationship, None, None) not in shapes_graph
+    assert (NS_KB["source-shape"], None, None) not in shapes_graph
+
+
+def _cached_ontology(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> List[urllib.request.Request]:
+    """
+    Download ONTOLOGY_TURTLE into a cache under tmp_path, make the cached copy stale, and return the list that later requests will be recorded in.
+    """
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    monkeypatch.setattr(
+        urllib.request,
+        "urlopen",
+        lambda request, timeout: FakeResponse(ONTOLOGY_TURTLE, '"v1"'),
+    )
+    _parse_ontology_file(Graph(), "ontology.ttl", ONTOLOGY_URL)
+    (nt_path,) = tmp_path.glob("case_cli_example/ontology-*.nt")
+    os.utime(nt_path, (0, 0))
+    return []
+
+
+def test_parse_ontology_file_fresh_cache(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    requests: List[urllib.request.Request] = []
+
+    def urlopen(request: urllib.request.Request, timeout: float) -> FakeResponse:
+        requests.append(request)
+        return FakeResponse(ONTOLOGY_TURTLE, '"v1"')
+
+    monkeypatch.setattr(urllib.request, "urlopen", urlopen)
+    for _ in range(2):
+        graph = Graph()
+        _parse_ontology_file(graph, "ontology.ttl", ONTOLOGY_URL)
+        assert len(graph) == 1
+    # The second call is served from the cache.
+    assert len(requests) == 1
+    (etag_path,) = tmp_path.glob("case_cli_example/ontology-*.etag")
+    assert etag_path.read_text() == '"v1"'
+
+
+def test_parse_ontology_file_not_modified(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    requests = _cached_ontology(monkeypatch, tmp_path)
+
+    def urlopen(request: urllib.request.Request, timeout: float) -> FakeResponse:
+        requests.append(request)
+        raise urllib.error.HTTPError(
+            request.full_url, 304, "Not Modified", request.headers, None  # type: ignore[arg-type]
+        )
+
+    monkeypatch.setattr(urllib.request, "urlopen", urlopen)
+    graph = Graph()
+    _parse_ontology_file(graph, "ontology.ttl", ONTOLOGY_URL)
+    assert len(graph) == 1
+    assert requests[0].get_header("If-none-match") == '"v1"'
+    # The cached copy is marked as checked.
+    (nt_path,) = tmp_path.glob("case_cli_example/ontology-*.nt")
+    assert nt_path.stat().st_mtime > 0
+
+
+@pytest.mark.parametrize(
+    "error",
+    [urllib.error.URLError("unreachable"), TimeoutError("timed out"), None],
+)
+def test_parse_ontology_file_failed_check(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    caplog: pytest.LogCaptureFixture,
+    error: Exception,
+) -> None:
+    """
+    If a stale cached copy cannot be checked, because the server is unreachable, the download times out, or the server sends something other than Turtle, the cached copy is used and is not checked again on the next call.
+    """
+    requests = _cached_ontology(monkeypatch, tmp_path)
+
+    def urlopen(request: urllib.request.Request, timeout: float) -> FakeResponse:
+        requests.append(request)
+        if error is not None:
+            raise error
+        return FakeResponse(b"<html><body>Sign in</body></html>", '"portal"')
+
+    monkeypatch.setattr(urllib.request, "urlopen", urlopen)
+    for _ in range(2):
+        graph = Graph()
+        with caplog.at_level(logging.WARNING):
+            _parse_ontology_file(graph, "ontology.ttl", ONTOLOGY_URL)
+        assert len(graph) == 1
+    assert len(requests) == 1
+    assert "using cached copy" in caplog.text
+    (etag_path,) = tmp_path.glob("case_cli_example/ontology-*.etag")
+    assert etag_path.read_text() == '"v1"'
+
+
+def test_parse_ontology_file_unwritable_cache(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    # A regular file where the cache directory's parent should be.
+    cache_home = tmp_path / "cache"
+    cache_home.write_text("")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(cache_home))
+    monkeypatch.setattr(
+        urllib.request,
+        "urlopen",
+        lambda request, timeout: FakeResponse(ONTOLOGY_TURTLE, '"v1"'),
+    )
+    graph = Graph()
+    with caplog.at_level(logging.WARNING):
+        _parse_ontology_file(graph, "ontology.ttl", ONTOLOGY_URL)
+    assert len(graph) == 1
+    assert "Could not cache" in caplog.text
+
+
+JENA_REPORT = """\
+@prefix sh: <http://www.w3.org/ns/shacl#> .
+[] a sh:ValidationReport ;
+    sh:conforms %s .
+"""
+
+
+@pytest.fixture
+def stub_shacl(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> Path:
+    """
+    Put a stub of Jena's shacl command on the PATH, and return the path of the file whose contents it prints as its validation report.  If that file is empty, the stub fails without printing anything.
+    """
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    report_path = tmp_path / "report.ttl"
+    report_path.write_text("")
+    command_path = bin_dir / "shacl"
+    command_path.write_text(
+        f"""#!/bin/sh
+[ "$1" = validate ] || exit 2
+if [ -s "{report_path}" ]; then
+    cat "{report_path}"
+else
+    echo "Bad shapes" >&2
+    exit 1
+fi
+"""
+    )
+    command_path.chmod(0o755)
+    monkeypatch.setenv("PATH", str(bin_dir) + os.pathsep + os.environ["PATH"])
+    monkeypatch.delenv("CASE_VALIDATOR", raising=False)
+    return report_path
+
+
+def test_jena_shacl_command(
+    monkeypatch: pytest.MonkeyPatch,
+    stub_shacl: Path,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    command = str(stub_shacl.parent / "bin" / "shacl")
+    assert _jena_shacl_command() == command
+    monkeypatch.setenv("CASE_VALIDATOR", "jena")
+    assert _jena_shacl_command() == command
+    monkeypatch.setenv("CASE_VALIDATOR", "pyshacl")
+    assert _jena_shacl_command() is None
+
+    monkeypatch.setenv("CASE_VALIDATOR", "Jena")
+    with caplog.at_level(logging.WARNING):
+        assert _jena_shacl_command() == command
+    assert "CASE_VALIDATOR='Jena'" in caplog.text
+
+
+@pytest.mark.parametrize("conforms", [True, False])
+def test_validate_with_jena(stub_shacl: Path, conforms: bool) -> None:
+    report = JENA_REPORT % str(conforms).lower()
+    stub_shacl.write_text(report)
+    command = _jena_shacl_command()
+    assert command is not None
+
+    computed_conforms, results_text = _validate_with_jena(
+        command, Graph(), Graph(), Graph()
+    )
+    assert computed_conforms is conforms
+    assert results_text == report
+
+
+def test_validate_with_jena_no_report(stub_shacl: Path) -> None:
+    command = _jena_shacl_command()
+    assert command is not None
+    with pytest.raises(RuntimeError, match="Bad shapes"):
+        _validate_with_jena(command, Graph(), Graph(), Graph())